@@ -17,6 +17,7 @@
 import log
 import _thread
 import usocket
+import uselect
 import checkNet
 from queue import Queue
 
@@ -29,6 +30,33 @@ from machine import UART, Pin
 logger = log.getLogger(__name__)
 log.basicConfig(level=log.DEBUG)
 
+# Payload logging on the UART/socket hot paths. Building the log string
+# materializes a repr of every payload even when the DEBUG level is
+# filtered out, so those sites are guarded by this flag and skipped
+# entirely in normal operation.
+DEBUG = False
+
+
+# Pin/UART constants resolved once at import time. This turns the
+# reflective format()+getattr lookup into a table index, and a GPIO or
+# UART number the module does not expose fails fast with a KeyError at
+# construction instead of deep inside setup.
+_PIN_IDS = {n: getattr(Pin, 'GPIO{}'.format(n)) for n in range(64) if hasattr(Pin, 'GPIO{}'.format(n))}
+_UART_IDS = {n: getattr(UART, 'UART{}'.format(n)) for n in range(8) if hasattr(UART, 'UART{}'.format(n))}
+
+# usocket constants and errno values preloaded as module-level ints, so
+# connect and the worker loops reference names instead of re-probing the
+# usocket module, and the errno comparisons lose their magic numbers
+_AF_INET = usocket.AF_INET
+_SOCK_STREAM = usocket.SOCK_STREAM
+_SOL_SOCKET = usocket.SOL_SOCKET
+_TCP_KEEPALIVE = usocket.TCP_KEEPALIVE
+_EAGAIN = 11
+
+# capacity of the UART->cloud ring buffer; one slot is kept free to
+# distinguish a full ring from an empty one
+_TX_RING_SIZE = 16384
+
 
 # Demo configuration
 DEMO_CONFIG = {
@@ -63,14 +91,68 @@ class Demo(object):
     def __init__(self, name, config=None):
         self.name = name
         self.config = config or DEMO_CONFIG
+
+        # materialize the config fields we use once; each ['...']['...']
+        # chain is two dict probes per access and port arrives as a
+        # string that would otherwise be re-parsed on every connect
+        server_config = self.config['SERVER']
+        self.host = server_config['host']
+        self.port = int(server_config['port'])
+        self.keep_alive = server_config['keep_alive']
+        uart_config = self.config['UART']
+        self.__uart_args = (
+            _UART_IDS[uart_config['port']],
+            uart_config['baudrate'],
+            uart_config['bytesize'],
+            uart_config['parity'],
+            uart_config['stopbits'],
+            uart_config['flowctl']
+        )
+
         self.__uart = None
         self.__sock = None
 
+        # cached (ip, port) from getaddrinfo; a DNS query over cellular
+        # costs 100-500 ms, so resolve once and only retry on a failed
+        # connect
+        self.__resolved = None
+
+        # cooperative-shutdown flag checked by the worker threads
+        self.__stopping = False
+
+        # Single-producer/single-consumer ring between the UART callback
+        # (producer, driver thread) and the tx worker (consumer). The
+        # callback copies received bytes into the ring and rings the
+        # doorbell queue; the worker sends contiguous spans straight out
+        # of the ring, so no per-chunk objects cross the threads.
+        self.__tx_ring = bytearray(_TX_RING_SIZE)
+        self.__tx_r = 0
+        self.__tx_w = 0
+        self.__tx_dropped = 0
+        self.__tx_doorbell = Queue()
+
+        # Pool of pre-allocated receive buffers for the socket recv worker.
+        # Buffers are borrowed/returned across iterations so the hot path
+        # never allocates and the GC never sees the payload buffers.
+        self.__rx_pool = Queue()
+        for _ in range(4):
+            self.__rx_pool.put(bytearray(1024))
+
         # Class <Pin> is used to control I/O pins.
         # Here we use <Pin> to control the blinking of LED.
         # Description: https://python.quectel.com/doc/API_reference/en/peripherals/machine.Pin.html
-        self.__led = Pin(getattr(Pin, 'GPIO{}'.format(self.config['LED']['GPIOn'])), Pin.OUT, Pin.PULL_PD, 0)
-        self.__led_blink_thread_id = None
+        self.__led = Pin(_PIN_IDS[self.config['LED']['GPIOn']], Pin.OUT, Pin.PULL_PD, 0)
+
+        # one long-lived LED thread consuming blink jobs; spawning a
+        # thread per blink costs milliseconds and fragments the heap.
+        # The worker only toggles a pin and sleeps, so a 2 KB stack is
+        # plenty and saves heap over the platform default. stack_size is
+        # a process-global default, so restore it afterwards for threads
+        # the platform libraries spawn
+        self.__led_q = Queue(maxsize=4)
+        default_stack = _thread.stack_size(2048)
+        _thread.start_new_thread(self.__led_worker, ())
+        _thread.stack_size(default_stack)
 
     def __str__(self):
         return 'Demo(name=\"{}\")'.format(self.name)
@@ -84,33 +166,96 @@ class Demo(object):
             args[2]: How much data is returned.
         :return:
         """
-        # get unread data size
-        unread_data_size = self.__uart.any()
-        # read all data as possible
-        data = self.__uart.read(unread_data_size)
-        logger.debug('read data from serial: {}'.format(data))
-        try:
-            # socket send method
-            # Description: https://python.quectel.com/doc/API_reference/en/stdlib/usocket.html
-            length = self.__sock.send(data)
-        except Exception as e:
-            logger.error('send data to cloud failed! pls check your connection. error: {}'.format(e))
+        # The callback runs on the UART driver thread, so keep it minimal:
+        # copy the pending bytes into the tx ring and ring the doorbell.
+        # Logging, socket send and LED blink all happen off this thread.
+        data = self.__uart.read(self.__uart.any())
+        if not data:
+            return
+        count = len(data)
+        ring = self.__tx_ring
+        write = self.__tx_w
+        free = (self.__tx_r - write - 1) % _TX_RING_SIZE
+        if count > free:
+            # ring full (cloud link stalled): drop rather than block the
+            # driver thread; the worker reports the tally
+            self.__tx_dropped += count
+            return
+        end = write + count
+        if end <= _TX_RING_SIZE:
+            ring[write:end] = data
         else:
-            self.blink(50, 50, 20)
-            logger.debug('send data to cloud successfully, actual sent bytes size: {}'.format(length))
+            head = _TX_RING_SIZE - write
+            ring[write:] = data[:head]
+            ring[:count - head] = data[head:]
+        self.__tx_w = end % _TX_RING_SIZE
+        if self.__tx_doorbell.empty():
+            self.__tx_doorbell.put(True)
+
+    def __tx_worker(self):
+        """thread worker draining the tx ring towards the cloud.
+
+        Bytes the UART callback wrote into the ring are sent as contiguous
+        spans, so a burst of N small serial chunks naturally coalesces
+        into one (or, across the wrap point, two) socket sends.
+        """
+        ring_mv = memoryview(self.__tx_ring)
+        # __tx_dropped only ever grows (the callback is its sole writer),
+        # so reporting deltas against a local high-water mark needs no
+        # reset and cannot lose a concurrent increment
+        reported = 0
+        while True:
+            self.__tx_doorbell.get()
+            if self.__stopping:
+                break
+            dropped = self.__tx_dropped
+            if dropped != reported:
+                logger.error('tx ring overflow, {} bytes dropped! pls check your connection.'.format(dropped - reported))
+                reported = dropped
+            while True:
+                read = self.__tx_r
+                write = self.__tx_w
+                if read == write:
+                    break
+                # contiguous span up to the wrap point; the next pass
+                # picks up the remainder
+                end = write if write > read else _TX_RING_SIZE
+                data = ring_mv[read:end]
+                if DEBUG:
+                    # log the size plus a bounded head; a full payload
+                    # repr allocates and escapes every byte
+                    logger.debug('read {} bytes from serial: {}'.format(len(data), bytes(data[:32])))
+                try:
+                    # send the whole span: with the TCP buffer nearly full,
+                    # send() may accept only part of the data and the tail
+                    # must not be silently dropped. On EAGAIN wait until the
+                    # socket turns writable instead of busy-retrying.
+                    # Description: https://python.quectel.com/doc/API_reference/en/stdlib/usocket.html
+                    size = len(data)
+                    sent = 0
+                    while sent < size:
+                        try:
+                            sent += self.__sock.send(data[sent:])
+                        except OSError as e:
+                            if e.args[0] == _EAGAIN:
+                                uselect.select([], [self.__sock], [], 0.5)
+                            else:
+                                raise
+                except Exception as e:
+                    logger.error('send data to cloud failed! pls check your connection. error: {}'.format(e))
+                else:
+                    self.blink(50, 50, 20)
+                    if DEBUG:
+                        logger.debug('send data to cloud successfully, actual sent bytes size: {}'.format(sent))
+                # the span is consumed either way; on failure the data is
+                # lost to the cloud but the ring must not wedge
+                self.__tx_r = end % _TX_RING_SIZE
 
     def open_serial(self):
         try:
             # UART communication
             # Description: https://python.quectel.com/doc/API_reference/en/peripherals/machine.UART.html
-            self.__uart = UART(
-                getattr(UART, 'UART{}'.format(self.config['UART']['port'])),
-                self.config['UART']['baudrate'],
-                self.config['UART']['bytesize'],
-                self.config['UART']['parity'],
-                self.config['UART']['stopbits'],
-                self.config['UART']['flowctl']
-            )
+            self.__uart = UART(*self.__uart_args)
             self.__uart.set_callback(self.__uart_cb)  # register UART callback
         except Exception as e:
             logger.error('open serial failed: {}'.format(e))
@@ -118,76 +263,196 @@ class Demo(object):
             logger.info('open serial successfully.')
 
     def __sock_recv_thread_worker(self):
+        # readiness-driven loop: the socket is non-blocking (set in
+        # connect_cloud) and we wait on uselect.poll instead of recv
+        # timeouts, which removes the timeout-exception control flow
+        # entirely. Description:
+        # https://python.quectel.com/doc/API_reference/en/stdlib/uselect.html
+        poller = uselect.poll()
+        poller.register(self.__sock, uselect.POLLIN)
+        poll = poller.poll
+
+        # bind everything the hot loop touches to locals once; on
+        # MicroPython LOAD_FAST is a single bytecode while each attribute
+        # access is a dict probe, and this loop runs per message
+        pool_get = self.__rx_pool.get
+        pool_put = self.__rx_pool.put
+        sock_recv_into = self.__sock.recv_into
+        uart_write = self.__uart.write
+        log_dbg = logger.debug
+        log_err = logger.error
+        log_crit = logger.critical
+        debug = DEBUG
+        os_error = OSError
+        eagain = _EAGAIN
+
         while True:
+            try:
+                events = poll(500)
+            except Exception as e:
+                # close() may close the socket out from under the
+                # poller; on some ports that raises here instead of
+                # reporting POLLNVAL
+                if not self.__stopping:
+                    log_crit('socket poll failed! error: {}; recv thread has broken!'.format(e))
+                break
+            if self.__stopping:
+                break
+            if not events:
+                # nothing readable yet
+                continue
+
+            # borrow buffers from the pool; returned at the end of the
+            # iteration so the loop itself is allocation-free
+            buf = pool_get()
+            scratch = pool_get()
             try:
                 # socket recv method
                 # Description: https://python.quectel.com/doc/API_reference/en/stdlib/usocket.html
-                data = self.__sock.recv(1024)
-                logger.debug('read data from socket: {}'.format(data))
+                try:
+                    size = sock_recv_into(buf)
+                except os_error as e:
+                    if e.args[0] == eagain:
+                        # readiness was spurious; wait again.
+                        continue
+                    raise
+                if size == 0:
+                    # recv returning 0 means the peer closed the
+                    # connection; a half-closed socket stays readable
+                    # forever, so exit instead of spinning on poll
+                    log_crit('socket closed by peer; recv thread exiting!')
+                    break
+
+                # drain whatever else the kernel already buffered, so a
+                # multi-segment TCP burst becomes one uart write instead
+                # of one write per segment
+                chunks = None
+                total = size
+                while total < 4096:
+                    try:
+                        count = sock_recv_into(scratch)
+                    except os_error as e:
+                        if e.args[0] == eagain:
+                            # kernel buffer is empty.
+                            break
+                        raise
+                    if count <= 0:
+                        break
+                    if chunks is None:
+                        chunks = [bytes(memoryview(buf)[:size])]
+                    chunks.append(bytes(memoryview(scratch)[:count]))
+                    total += count
+
+                data = b''.join(chunks) if chunks else memoryview(buf)[:size]
+                if debug:
+                    # size plus a bounded head, as on the serial path
+                    log_dbg('read {} bytes from socket: {}'.format(total, bytes(data[:32])))
 
                 try:
                     # uart write method
                     # Description: https://python.quectel.com/doc/API_reference/en/peripherals/machine.UART.html
-                    length = self.__uart.write(data)
+                    length = uart_write(data)
                 except Exception as e:
-                    logger.error('send data to serial failed! pls check serial port status. error: {}'.format(e))
+                    log_err('send data to serial failed! pls check serial port status. error: {}'.format(e))
                 else:
-                    logger.debug('send data to serial successfully, actual sent bytes size: {}'.format(length))
+                    if debug:
+                        log_dbg('send data to serial successfully, actual sent bytes size: {}'.format(length))
             except Exception as e:
-                if isinstance(e, OSError) and e.args[0] == 110:
-                    # read timeout.
-                    continue
-                else:
-                    logger.critical('socket read failed! error: {}; recv thread has broken!'.format(e))
+                if self.__stopping:
+                    # the socket was closed under us on purpose
                     break
+                log_crit('socket read failed! error: {}; recv thread has broken!'.format(e))
+                break
+            finally:
+                pool_put(buf)
+                pool_put(scratch)
 
     def connect_cloud(self):
         try:
-            # read server configure
-            host = self.config['SERVER']['host']
-            port = self.config['SERVER']['port']
-            timeout = self.config['SERVER']['timeout']
-            keep_alive = self.config['SERVER']['keep_alive']
-
-            # we parse the domain name of DNS.
+            # we parse the domain name of DNS (cached across reconnects).
             # Description: https://python.quectel.com/doc/API_reference/en/stdlib/usocket.html
-            rv = usocket.getaddrinfo(host, port)
-            if not rv:
-                raise ValueError('DNS detect error for addr: {},{}'.format(host, port))
-            ip, port = rv[0][4]
+            if self.__resolved is None:
+                rv = usocket.getaddrinfo(self.host, self.port)
+                if not rv:
+                    raise ValueError('DNS detect error for addr: {},{}'.format(self.host, self.port))
+                self.__resolved = rv[0][4]
+            ip, port = self.__resolved
 
             # tcp socket creating flow
             # Description: https://python.quectel.com/doc/API_reference/en/stdlib/usocket.html
-            self.__sock = usocket.socket(usocket.AF_INET, usocket.SOCK_STREAM)
-            self.__sock.connect((ip, port))
-            self.__sock.settimeout(timeout)
-            self.__sock.setsockopt(usocket.SOL_SOCKET, usocket.TCP_KEEPALIVE, keep_alive)
+            self.__sock = usocket.socket(_AF_INET, _SOCK_STREAM)
+            try:
+                self.__sock.connect((ip, port))
+            except OSError:
+                # the cached address may be stale; re-resolve next attempt
+                self.__resolved = None
+                raise
+            self.__sock.setsockopt(_SOL_SOCKET, _TCP_KEEPALIVE, self.keep_alive)
+
+            # disable Nagle: serial traffic is small messages where
+            # coalescing delay adds visible head-of-line latency
+            if hasattr(usocket, 'TCP_NODELAY'):
+                self.__sock.setsockopt(usocket.IPPROTO_TCP, usocket.TCP_NODELAY, 1)
+            # keep the kernel buffers modest; the defaults occupy scarce
+            # RAM on the module and 8 KB matches our batch sizes
+            if hasattr(usocket, 'SO_SNDBUF'):
+                self.__sock.setsockopt(_SOL_SOCKET, usocket.SO_SNDBUF, 8192)
+            if hasattr(usocket, 'SO_RCVBUF'):
+                self.__sock.setsockopt(_SOL_SOCKET, usocket.SO_RCVBUF, 8192)
+
+            # the recv worker waits for readiness via uselect.poll, so
+            # the socket itself never blocks
+            self.__sock.setblocking(False)
         except Exception as e:
             logger.error('connect cloud failed: {}'.format(e))
         else:
+            self.__stopping = False
+            # explicit small stacks for the I/O workers instead of the
+            # platform default; 4 KB leaves room for the error-path log
+            # formatting while still saving heap. stack_size is a
+            # process-global default, so restore it once our threads are
+            # spawned
+            default_stack = _thread.stack_size(4096)
             _thread.start_new_thread(self.__sock_recv_thread_worker, ())
+            _thread.start_new_thread(self.__tx_worker, ())
+            _thread.stack_size(default_stack)
             logger.info('connect cloud successfully.')
 
-    def blink(self, on_remaining, off_remaining, count):
-        """start LED blink"""
-        if self.__led_blink_thread_id and _thread.threadIsRunning(self.__led_blink_thread_id):
-            # avoid repeating
-            return
+    def close(self):
+        """stop the worker threads and close the cloud connection.
 
-        def led_blink_thread_worker(on_remaining, off_remaining, count):
-            """actual thread work function; make the LED on/off"""
+        Closing the socket makes the recv worker's poll wake up within
+        its 500 ms timeout instead of waiting out the TCP keepalive.
+        """
+        self.__stopping = True
+        self.__tx_doorbell.put(True)  # unblock the tx worker
+        if self.__sock is not None:
+            try:
+                self.__sock.close()
+            except Exception as e:
+                logger.error('close socket failed: {}'.format(e))
+            self.__sock = None
+
+    def __led_worker(self):
+        """thread worker driving the LED; consumes (on, off, count) jobs"""
+        q_get = self.__led_q.get
+        led_write = self.__led.write
+        sleep_ms = utime.sleep_ms
+        while True:
+            on_remaining, off_remaining, count = q_get()
             while count > 0:
-                self.__led.write(1)  # on led
-                utime.sleep_ms(on_remaining)
-                self.__led.write(0)  # off led
-                utime.sleep_ms(off_remaining)
+                led_write(1)  # on led
+                sleep_ms(on_remaining)
+                led_write(0)  # off led
+                sleep_ms(off_remaining)
                 count -= 1
 
-        # we blink LED light in a thread
-        self.__led_blink_thread_id = _thread.start_new_thread(
-            led_blink_thread_worker,
-            (on_remaining, off_remaining, count)
-        )
+    def blink(self, on_remaining, off_remaining, count):
+        """start LED blink"""
+        if self.__led_q.size() >= 4:
+            # the LED is busy enough already; drop rather than backlog
+            return
+        self.__led_q.put((on_remaining, off_remaining, count))
 
     def run(self):
         logger.info('{} run...'.format(self))
@@ -206,7 +471,9 @@ if __name__ == '__main__':
     )
     checknet.poweron_print_once()
 
-    # check network until ready
+    # check network until ready, backing off between attempts so a slow
+    # modem attach does not keep the CPU spinning at boot
+    delay = 200
     while True:
         codes = checkNet.waitNetworkReady()
         if codes == (3, 1):
@@ -214,6 +481,8 @@ if __name__ == '__main__':
             break
         else:
             print('network not ready, error code is {}.'.format(codes))
+            utime.sleep_ms(delay)
+            delay = min(delay * 2, 5000)
 
     # Demo application run forever
     demo.run()